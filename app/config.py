@@ -1,16 +1,30 @@
-import os
-from typing import Optional
-from pydantic_settings import BaseSettings
-from pydantic import field_validator, Field
+import io
+from functools import lru_cache
+from typing import Annotated, Optional, Dict
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field, StringConstraints
 import secrets
 from pathlib import Path
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # project root
 env_path = BASE_DIR / ".env"
-load_dotenv(env_path, override=True)  
 
-class Settings(BaseSettings):
+# Checked by pydantic-core itself, no Python validator callbacks
+DatabaseURL = Annotated[str, StringConstraints(pattern=r"^(postgresql|mysql(\+pymysql)?|sqlite)://")]
+SecretKey = Annotated[str, StringConstraints(min_length=32)]
+
+class AppBaseSettings(BaseSettings):
+    """Shared settings configuration, declared once at class level"""
+    
+    model_config = SettingsConfigDict(
+        # .env is read once by get_settings() and passed in explicitly
+        case_sensitive=False,
+        extra="ignore",
+        frozen=True,
+    )
+
+class Settings(AppBaseSettings):
     # Application Settings
     app_name: str = "Amazon PayAssist Fraud Detection"
     app_version: str = "1.0.0"
@@ -22,7 +36,7 @@ class Settings(BaseSettings):
     reload: bool = False
     
     # Database Settings - Now properly configured for env vars
-    database_url: str = Field(
+    database_url: DatabaseURL = Field(
         default="sqlite:///./fraud_detection.db",  # Fallback for development
         description="Database connection URL"
     )
@@ -30,9 +44,13 @@ class Settings(BaseSettings):
         default="redis://localhost:6379/0",
         description="Redis connection URL"
     )
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = False  # enable for HA setups where connections can drop
+    db_pool_warm_size: int = 5  # connections opened at startup
     
     # Security Settings - Better secret key handling
-    secret_key: str = Field(
+    secret_key: SecretKey = Field(
         default_factory=lambda: secrets.token_urlsafe(32),
         description="Secret key for JWT tokens"
     )
@@ -73,25 +91,28 @@ class Settings(BaseSettings):
     kafka_topic: str = "payment-events"
     enable_kafka: bool = False
     
-    @field_validator('database_url')
-    @classmethod
-    def validate_database_url(cls, v):
-        if not v.startswith(('postgresql://', 'mysql://', 'sqlite://', 'mysql+pymysql://')):
-            raise ValueError('Invalid database URL')
-        return v
-    
-    @field_validator('secret_key')
-    @classmethod
-    def validate_secret_key(cls, v):
-        if len(v) < 32:
-            raise ValueError('Secret key must be at least 32 characters long')
-        return v
-    
-    model_config = {
-        "env_file": env_path,        # absolute path → always found
-        "env_file_encoding": "utf-8",
-        "case_sensitive": False,
-        "extra": "ignore",
-    }
+def _read_env_file() -> Dict[str, str]:
+    """Read and parse the .env file in a single pass"""
+    try:
+        with open(env_path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return {}
+
+    parsed = dotenv_values(stream=io.StringIO(raw.decode("utf-8")))
+    # Field names are lower-case; .env values win over the process env
+    return {key.lower(): value for key, value in parsed.items() if value is not None}
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the application settings once and reuse them"""
+    return Settings(**_read_env_file())
+
+settings = get_settings()
 
-settings = Settings()
+# Hot-path values bound once as plain module constants
+APP_NAME = settings.app_name
+APP_VERSION = settings.app_version
+DEBUG = settings.debug
+RATE_LIMIT_REQUESTS = settings.rate_limit_requests
+RATE_LIMIT_WINDOW = settings.rate_limit_window
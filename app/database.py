@@ -2,7 +2,7 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-import redis
+import redis.asyncio as redis
 import asyncio
 from typing import Optional
 import logging
@@ -35,7 +35,9 @@ def create_database_engine():
         # PostgreSQL configuration for production
         engine = create_engine(
             settings.database_url,
-            pool_pre_ping=True,  # Validate connections before use
+            pool_pre_ping=settings.db_pool_pre_ping,  # Validate connections before use
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
             pool_recycle=300,    # Recycle connections every 5 minutes
             echo=settings.debug
         )
@@ -43,7 +45,7 @@ def create_database_engine():
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     logger.info(f"Database engine created for: {settings.database_url.split('@')[-1] if '@' in settings.database_url else settings.database_url}")
 
-def create_redis_connection():
+async def create_redis_connection():
     """Create Redis connection"""
     global redis_client
     
@@ -55,12 +57,56 @@ def create_redis_connection():
             socket_timeout=5
         )
         # Test connection
-        redis_client.ping()
+        await redis_client.ping()
         logger.info("Redis connection established")
     except Exception as e:
         logger.warning(f"Redis connection failed: {e}")
         redis_client = None
 
+async def close_redis_connection():
+    """Close Redis connection"""
+    global redis_client
+    
+    if redis_client is not None:
+        await redis_client.aclose()
+        redis_client = None
+        logger.info("Redis connection closed")
+
+async def warm_connection_pool(size: Optional[int] = None):
+    """Open pool connections in parallel so early requests skip the handshake"""
+    if engine is None:
+        create_database_engine()
+    
+    size = settings.db_pool_warm_size if size is None else size
+    # Connections beyond pool_size are overflow and get closed on return
+    size = min(size, settings.db_pool_size)
+    if size <= 0 or settings.database_url.startswith("sqlite"):
+        # StaticPool holds a single connection; nothing to warm
+        return
+    
+    def open_connection():
+        connection = engine.connect()
+        try:
+            connection.execute(text("SELECT 1"))
+        except Exception:
+            connection.close()
+            raise
+        return connection
+    
+    # Hold every connection until all are open so the pool keeps `size` of them
+    results = await asyncio.gather(
+        *[asyncio.to_thread(open_connection) for _ in range(size)],
+        return_exceptions=True
+    )
+    warmed = 0
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"Connection pool warm-up failed: {result}")
+            continue
+        result.close()
+        warmed += 1
+    logger.info(f"Warmed {warmed}/{size} database connections")
+
 def get_database_session():
     """Get database session"""
     if SessionLocal is None:
@@ -91,10 +137,10 @@ async def check_redis_health() -> tuple[bool, str]:
     """Check Redis connectivity for health checks"""
     try:
         if redis_client is None:
-            create_redis_connection()
+            await create_redis_connection()
         
         if redis_client:
-            redis_client.ping()
+            await redis_client.ping()
             return True, "connected"
         else:
             return False, "not configured"
@@ -102,12 +148,21 @@ async def check_redis_health() -> tuple[bool, str]:
         logger.error(f"Redis health check failed: {e}")
         return False, f"error: {str(e)[:50]}"
 
-def initialize_database():
+async def initialize_database():
     """Initialize database connections"""
     logger.info("Initializing database connections...")
-    create_database_engine()
-    create_redis_connection()
+    if engine is None:
+        create_database_engine()
+    await create_redis_connection()
     logger.info("Database initialization complete")
 
-# Initialize on import
-initialize_database() 
\ No newline at end of file
+async def close_database():
+    """Dispose database engine and close Redis connection"""
+    global engine, SessionLocal
+    
+    if engine is not None:
+        engine.dispose()
+        engine = None
+        SessionLocal = None
+    await close_redis_connection()
+    logger.info("Database connections closed")
@@ -1,24 +1,52 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
-from app.schemas import PaymentEvent, FraudDetectionResult, HealthCheck
+from app.schemas import PaymentEvent, HealthCheck
 from app.logger import logger
-from app.config import settings
-from app.database import check_database_health, check_redis_health
+from app.config import settings, APP_NAME, APP_VERSION, DEBUG, RATE_LIMIT_REQUESTS
+from app.database import (
+    check_database_health,
+    check_redis_health,
+    initialize_database,
+    warm_connection_pool,
+    close_database,
+)
+from app.redis_service import fraud_redis
+
+UTC = timezone.utc
+RATE_LIMIT_STRING = f"{RATE_LIMIT_REQUESTS}/minute"
+
+def client_address(request: Request) -> str:
+    """Rate-limit key: peer address straight from the ASGI scope"""
+    client = request.scope.get("client")
+    return client[0] if client else "127.0.0.1"
 
 # Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=client_address)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connections are opened once the server starts, not on import
+    await initialize_database()
+    await warm_connection_pool()
+    await fraud_redis.start_flusher()
+    yield
+    await fraud_redis.stop_flusher()
+    await close_database()
 
 app = FastAPI(
-    title=settings.app_name,
-    version=settings.app_version,
-    debug=settings.debug
+    title=APP_NAME,
+    version=APP_VERSION,
+    debug=DEBUG,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add middleware
@@ -33,10 +61,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(
-    TrustedHostMiddleware, 
-    allowed_hosts=["localhost", "127.0.0.1", "*"]  # Configure for production
-)
+ALLOWED_HOSTS = ["localhost", "127.0.0.1", "*"]  # Configure for production
+
+# A wildcard host makes TrustedHostMiddleware a no-op; don't pay for it per request
+if not DEBUG and "*" not in ALLOWED_HOSTS:
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=ALLOWED_HOSTS)
 
 @app.get("/health", response_model=HealthCheck)
 async def health_check():
@@ -53,14 +82,14 @@ async def health_check():
     
     return HealthCheck(
         status=overall_status,
-        timestamp=datetime.now(timezone.utc),
-        version=settings.app_version,
+        timestamp=datetime.now(UTC),
+        version=APP_VERSION,
         database_status=db_status,
         redis_status=redis_status
     )
 
 @app.post("/ingest-event", response_model=dict)
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
+@limiter.limit(RATE_LIMIT_STRING)
 async def ingest_event(request: Request, event: PaymentEvent):
     """
     Ingest payment events for fraud detection analysis
@@ -70,6 +99,14 @@ async def ingest_event(request: Request, event: PaymentEvent):
     try:
         logger.info(f"Received payment event: {event.transaction_id}")
         
+        # Batched into Redis by the background flusher
+        await fraud_redis.track_async(
+            event.user_id,
+            event.model_dump(include={
+                "transaction_id", "amount", "currency", "payment_method", "status", "merchant_id"
+            })
+        )
+        
         # TODO: Add event to database/queue for processing
         # TODO: Trigger fraud detection analysis
         # TODO: Return fraud detection results
@@ -91,8 +128,8 @@ async def ingest_event(request: Request, event: PaymentEvent):
 @app.get("/")
 async def root():
     return {
-        "message": f"Welcome to {settings.app_name}",
-        "version": settings.app_version,
+        "message": f"Welcome to {APP_NAME}",
+        "version": APP_VERSION,
         "status": "running"
     }
 
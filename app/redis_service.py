@@ -1,177 +1,346 @@
-import json
-import redis
-from datetime import datetime, timedelta
+import asyncio
+import orjson
+import time
+import redis.asyncio as redis
+from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
-from app.database import redis_client
-from app.config import settings
+from app import database
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Redis key builders (bound str.__mod__, cheaper than an f-string per call)
+_K_TX = "user:tx:%s".__mod__
+_K_FEATURES = "user:features:%s".__mod__
+_K_RATE_LIMIT = "rate_limit:%s".__mod__
+_K_PATTERN = "pattern:%s".__mod__
+_K_SESSION_RISK = "session:risk:%s".__mod__
+
+# Atomic fixed-window counter: INCR, set TTL on first hit, report whether over limit
+RATE_LIMIT_LUA = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if current > tonumber(ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# The user features hash TTL only ever grows, so longer-lived fields are not cut short.
+# Compares TTL in Lua rather than using EXPIRE NX/GT, which need Redis 7.
+EXTEND_TTL_LUA = """
+local function extend_ttl(key, ttl)
+    if redis.call('TTL', key) < tonumber(ttl) then
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+"""
+
+# Write feature fields (ARGV[2..] as field/value pairs) and extend the hash TTL to ARGV[1]
+SET_FEATURES_LUA = EXTEND_TTL_LUA + """
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+extend_ttl(KEYS[1], ARGV[1])
+"""
+
+# Bump the failed-attempt counter in the user features hash, restarting it once its window lapsed
+FAILED_ATTEMPT_LUA = EXTEND_TTL_LUA + """
+local expires_at = tonumber(redis.call('HGET', KEYS[1], 'failed_attempts_expires_at'))
+if expires_at and expires_at <= tonumber(ARGV[1]) then
+    redis.call('HDEL', KEYS[1], 'failed_attempts')
+end
+local count = redis.call('HINCRBY', KEYS[1], 'failed_attempts', 1)
+redis.call('HSET', KEYS[1], 'failed_attempts_expires_at', tonumber(ARGV[1]) + tonumber(ARGV[2]))
+extend_ttl(KEYS[1], ARGV[2])
+return count
+"""
+
+# Background transaction flusher tuning
+TX_FLUSH_INTERVAL = 0.005  # seconds to wait for a batch to fill
+TX_FLUSH_BATCH_SIZE = 500
+TX_QUEUE_MAXSIZE = 10000  # bound memory if Redis falls behind
+
+def _iso_now(ts: Optional[float] = None) -> str:
+    """ISO-8601 UTC timestamp for values persisted to Redis"""
+    return datetime.fromtimestamp(time.time() if ts is None else ts, tz=timezone.utc).isoformat()
+
+def _stream_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a transaction into Redis stream fields"""
+    fields = {}
+    for name, value in data.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = int(value)
+        elif not isinstance(value, (str, int, float, bytes)):
+            value = orjson.dumps(value)  # nested values stay JSON-encoded
+        fields[name] = value
+    return fields
+
 class FraudRedisService:
     """Redis service for fraud detection operations"""
     
     def __init__(self):
-        self.redis = redis_client
         self.default_expiry = 3600  # 1 hour default TTL
+        self._scripts: Dict[str, Any] = {}
+        self._tx_queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    @property
+    def redis(self) -> Optional[redis.Redis]:
+        """Shared async client, created during app startup"""
+        return database.redis_client
+    
+    def _script(self, source: str):
+        """Lua script registered once per service and reused via EVALSHA"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self.redis.register_script(source)
+        return script
     
     # ================================
     # User Behavior Tracking
     # ================================
     
-    def track_user_transaction(self, user_id: str, transaction_data: Dict[str, Any]):
+    def _add_transaction_commands(self, pipe, user_id: str, transaction_data: Dict[str, Any]):
+        """Queue the XADD/EXPIRE commands for one transaction on a pipeline"""
+        key = _K_TX(user_id)
+        # Capped stream, approximate trim keeps roughly the last 50 transactions
+        pipe.xadd(key, _stream_fields(transaction_data), maxlen=50, approximate=True)
+        pipe.expire(key, 86400 * 7)  # Expire after 7 days
+    
+    async def track_user_transaction(self, user_id: str, transaction_data: Dict[str, Any]):
         """Track recent user transactions for pattern analysis"""
-        key = f"user:transactions:{user_id}"
+        pipe = self.redis.pipeline()
+        self._add_transaction_commands(pipe, user_id, {**transaction_data, "timestamp": _iso_now()})
+        await pipe.execute()
+    
+    async def track_async(self, user_id: str, transaction_data: Dict[str, Any]):
+        """Enqueue a transaction for the background flusher"""
+        if self.redis is None:
+            # Redis unavailable; tracking is best-effort
+            return
+        if self._tx_queue is None:
+            # Flusher not running (e.g. outside the app lifespan)
+            try:
+                await self.track_user_transaction(user_id, transaction_data)
+            except Exception as e:
+                logger.error(f"Failed to track transaction for user {user_id}: {e}")
+            return
+        try:
+            self._tx_queue.put_nowait((user_id, {**transaction_data, "timestamp": _iso_now()}))
+        except asyncio.QueueFull:
+            logger.warning(f"Transaction queue full, dropping transaction for user {user_id}")
+    
+    async def start_flusher(self):
+        """Start the background task that batches transaction writes"""
+        if self._flush_task is not None:
+            return
+        self._tx_queue = asyncio.Queue(maxsize=TX_QUEUE_MAXSIZE)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info("Transaction flusher started")
+    
+    async def stop_flusher(self):
+        """Stop the flusher and write out anything still queued"""
+        if self._flush_task is None:
+            return
+        self._flush_task.cancel()
+        try:
+            await self._flush_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Transaction flusher exited with error: {e}")
         
-        # Add transaction to list (keep last 50)
-        transaction_json = json.dumps({
-            **transaction_data,
-            "timestamp": datetime.now().isoformat()
-        })
+        while not self._tx_queue.empty():
+            await self._flush_pending()
         
-        pipe = self.redis.pipeline()
-        pipe.lpush(key, transaction_json)
-        pipe.ltrim(key, 0, 49)  # Keep only last 50 transactions
-        pipe.expire(key, 86400 * 7)  # Expire after 7 days
-        pipe.execute()
+        self._flush_task = None
+        self._tx_queue = None
+        logger.info("Transaction flusher stopped")
     
-    def get_user_recent_transactions(self, user_id: str, count: int = 10) -> List[Dict]:
-        """Get user's recent transactions"""
-        key = f"user:transactions:{user_id}"
-        transactions = self.redis.lrange(key, 0, count - 1)
-        return [json.loads(tx) for tx in transactions]
+    async def _flush_loop(self):
+        """Drain the queue in batches, one pipeline round trip per batch"""
+        while True:
+            first = await self._tx_queue.get()
+            try:
+                # Give concurrent requests a moment to join the batch
+                await asyncio.sleep(TX_FLUSH_INTERVAL)
+            finally:
+                await self._flush_pending(first)
     
-    def track_failed_attempt(self, user_id: str):
-        """Track failed payment attempts"""
-        key = f"user:failed_attempts:{user_id}"
-        pipe = self.redis.pipeline()
-        pipe.incr(key)
-        pipe.expire(key, 3600)  # Reset every hour
-        pipe.execute()
+    async def _flush_pending(self, first=None):
+        """Write up to TX_FLUSH_BATCH_SIZE queued transactions in a single pipeline"""
+        batch = [first] if first is not None else []
+        while len(batch) < TX_FLUSH_BATCH_SIZE and not self._tx_queue.empty():
+            batch.append(self._tx_queue.get_nowait())
+        if not batch:
+            return
+        
+        if self.redis is None:
+            logger.warning(f"Redis unavailable, dropping {len(batch)} queued transactions")
+            return
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id, transaction_data in batch:
+                self._add_transaction_commands(pipe, user_id, transaction_data)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} transactions: {e}")
+    
+    async def get_user_recent_transactions(self, user_id: str, count: int = 10) -> List[Dict]:
+        """Get user's recent transactions, newest first (field values are strings)"""
+        key = _K_TX(user_id)
+        entries = await self.redis.xrevrange(key, count=count)
+        return [fields for _, fields in entries]
     
-    def get_failed_attempts(self, user_id: str) -> int:
+    async def track_failed_attempt(self, user_id: str):
+        """Track failed payment attempts (counter resets after an hour)"""
+        key = _K_FEATURES(user_id)
+        # Run on the current client; the cached script may have been registered on a closed one
+        await self._script(FAILED_ATTEMPT_LUA)(keys=[key], args=[int(time.time()), 3600], client=self.redis)
+    
+    async def get_failed_attempts(self, user_id: str) -> int:
         """Get failed attempts count"""
-        key = f"user:failed_attempts:{user_id}"
-        count = self.redis.get(key)
-        return int(count) if count else 0
+        features = await self.get_user_features(user_id)
+        return features["failed_attempts"]
     
     # ================================
-    # Rate Limiting
+    # User Features
     # ================================
     
-    def is_rate_limited(self, identifier: str, limit: int, window_seconds: int) -> bool:
-        """Check if identifier is rate limited"""
-        key = f"rate_limit:{identifier}"
-        current = self.redis.get(key)
-        
-        if current is None:
-            # First request
-            pipe = self.redis.pipeline()
-            pipe.set(key, 1)
-            pipe.expire(key, window_seconds)
-            pipe.execute()
-            return False
+    async def get_user_features(self, user_id: str) -> Dict[str, Any]:
+        """Get failed attempts, cached risk score and suspicious flag in one round trip"""
+        key = _K_FEATURES(user_id)
+        data = await self.redis.hgetall(key)
+        now = time.time()
         
-        if int(current) >= limit:
-            return True
+        def live(field: str, expires_field: str) -> Optional[str]:
+            # Fields carry their own expiry since the hash TTL is shared
+            expires_at = data.get(expires_field)
+            if expires_at is None or float(expires_at) <= now:
+                return None
+            return data.get(field)
         
-        # Increment counter
-        self.redis.incr(key)
-        return False
+        failed_attempts = live("failed_attempts", "failed_attempts_expires_at")
+        risk_score = live("risk_score", "risk_score_expires_at")
+        suspicious_reason = live("suspicious_reason", "suspicious_expires_at")
+        return {
+            "failed_attempts": int(failed_attempts) if failed_attempts else 0,
+            "risk_score": float(risk_score) if risk_score else None,
+            "is_suspicious": suspicious_reason is not None,
+            "suspicious_reason": suspicious_reason,
+        }
+    
+    async def _set_features(self, user_id: str, ttl: int, fields: Dict[str, Any]):
+        """Write feature fields and extend the hash TTL in one round trip"""
+        args = [ttl]
+        for name, value in fields.items():
+            args += [name, value]
+        await self._script(SET_FEATURES_LUA)(keys=[_K_FEATURES(user_id)], args=args, client=self.redis)
+    
+    # ================================
+    # Rate Limiting
+    # ================================
+    
+    async def is_rate_limited(self, identifier: str, limit: int, window_seconds: int) -> bool:
+        """Check if identifier is rate limited"""
+        key = _K_RATE_LIMIT(identifier)
+        # Single round trip; EVALSHA-cached server side
+        return bool(await self._script(RATE_LIMIT_LUA)(keys=[key], args=[window_seconds, limit], client=self.redis))
     
     # ================================
     # Risk Scoring Cache
     # ================================
     
-    def cache_user_risk_score(self, user_id: str, risk_score: float, ttl: int = 1800):
+    async def cache_user_risk_score(self, user_id: str, risk_score: float, ttl: int = 1800):
         """Cache user risk score (30 min default)"""
-        key = f"risk_score:{user_id}"
-        self.redis.setex(key, ttl, risk_score)
+        await self._set_features(user_id, ttl, {
+            "risk_score": risk_score,
+            "risk_score_expires_at": int(time.time()) + ttl
+        })
     
-    def get_cached_risk_score(self, user_id: str) -> Optional[float]:
+    async def get_cached_risk_score(self, user_id: str) -> Optional[float]:
         """Get cached risk score"""
-        key = f"risk_score:{user_id}"
-        score = self.redis.get(key)
-        return float(score) if score else None
+        features = await self.get_user_features(user_id)
+        return features["risk_score"]
     
     # ================================
     # Suspicious Activity Flags
     # ================================
     
-    def flag_suspicious_user(self, user_id: str, reason: str, duration_hours: int = 24):
+    async def flag_suspicious_user(self, user_id: str, reason: str, duration_hours: int = 24):
         """Flag user as suspicious"""
-        key = f"suspicious:{user_id}"
-        data = {
-            "reason": reason,
-            "flagged_at": datetime.now().isoformat(),
-            "expires_at": (datetime.now() + timedelta(hours=duration_hours)).isoformat()
-        }
-        self.redis.setex(key, duration_hours * 3600, json.dumps(data))
+        ttl = duration_hours * 3600
+        now = time.time()
+        await self._set_features(user_id, ttl, {
+            "suspicious_reason": reason,
+            "suspicious_flagged_at": _iso_now(now),
+            "suspicious_expires_at": int(now) + ttl
+        })
         logger.warning(f"User {user_id} flagged as suspicious: {reason}")
     
-    def is_user_suspicious(self, user_id: str) -> tuple[bool, Optional[str]]:
+    async def is_user_suspicious(self, user_id: str) -> tuple[bool, Optional[str]]:
         """Check if user is flagged as suspicious"""
-        key = f"suspicious:{user_id}"
-        data = self.redis.get(key)
-        if data:
-            flag_info = json.loads(data)
-            return True, flag_info["reason"]
-        return False, None
-    
-    def unflag_user(self, user_id: str):
+        features = await self.get_user_features(user_id)
+        return features["is_suspicious"], features["suspicious_reason"]
+    
+    async def unflag_user(self, user_id: str):
         """Remove suspicious flag"""
-        key = f"suspicious:{user_id}"
-        self.redis.delete(key)
+        key = _K_FEATURES(user_id)
+        await self.redis.hdel(key, "suspicious_reason", "suspicious_flagged_at", "suspicious_expires_at")
     
     # ================================
     # Pattern Detection Cache
     # ================================
     
-    def cache_pattern_analysis(self, pattern_key: str, analysis_result: Dict, ttl: int = 3600):
+    async def cache_pattern_analysis(self, pattern_key: str, analysis_result: Dict, ttl: int = 3600):
         """Cache pattern analysis results"""
-        key = f"pattern:{pattern_key}"
-        self.redis.setex(key, ttl, json.dumps(analysis_result))
+        key = _K_PATTERN(pattern_key)
+        await self.redis.setex(key, ttl, orjson.dumps(analysis_result))
     
-    def get_cached_pattern(self, pattern_key: str) -> Optional[Dict]:
+    async def get_cached_pattern(self, pattern_key: str) -> Optional[Dict]:
         """Get cached pattern analysis"""
-        key = f"pattern:{pattern_key}"
-        result = self.redis.get(key)
-        return json.loads(result) if result else None
+        key = _K_PATTERN(pattern_key)
+        result = await self.redis.get(key)
+        return orjson.loads(result) if result else None
     
     # ================================
     # Event Queue Management
     # ================================
     
-    def queue_for_ml_analysis(self, transaction_data: Dict):
+    async def queue_for_ml_analysis(self, transaction_data: Dict):
         """Queue transaction for ML analysis"""
         queue_key = "ml_analysis_queue"
-        self.redis.lpush(queue_key, json.dumps(transaction_data))
+        await self.redis.lpush(queue_key, orjson.dumps(transaction_data))
     
-    def get_queued_transactions(self, batch_size: int = 10) -> List[Dict]:
+    async def get_queued_transactions(self, batch_size: int = 10) -> List[Dict]:
         """Get transactions from ML analysis queue"""
         queue_key = "ml_analysis_queue"
         transactions = []
         for _ in range(batch_size):
-            item = self.redis.rpop(queue_key)
+            item = await self.redis.rpop(queue_key)
             if not item:
                 break
-            transactions.append(json.loads(item))
+            transactions.append(orjson.loads(item))
         return transactions
     
     # ================================
     # Session Management
     # ================================
     
-    def store_session_risk(self, session_id: str, risk_data: Dict, ttl: int = 3600):
+    async def store_session_risk(self, session_id: str, risk_data: Dict, ttl: int = 3600):
         """Store session-based risk data"""
-        key = f"session:risk:{session_id}"
-        self.redis.setex(key, ttl, json.dumps(risk_data))
+        key = _K_SESSION_RISK(session_id)
+        await self.redis.setex(key, ttl, orjson.dumps(risk_data))
     
-    def get_session_risk(self, session_id: str) -> Optional[Dict]:
+    async def get_session_risk(self, session_id: str) -> Optional[Dict]:
         """Get session risk data"""
-        key = f"session:risk:{session_id}"
-        data = self.redis.get(key)
-        return json.loads(data) if data else None
+        key = _K_SESSION_RISK(session_id)
+        data = await self.redis.get(key)
+        return orjson.loads(data) if data else None
 
 # Initialize service
 fraud_redis = FraudRedisService() 
\ No newline at end of file
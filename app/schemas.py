@@ -1,6 +1,6 @@
-from pydantic import BaseModel, validator, Field
+from pydantic import BaseModel, ConfigDict, field_validator, Field, StringConstraints
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Annotated, Optional, Dict, Any, List
 from enum import Enum
 
 class PaymentStatus(str, Enum):
@@ -35,23 +35,33 @@ class LocationInfo(BaseModel):
     longitude: Optional[float] = None
     timezone: Optional[str] = None
 
+# Constrained strings validated entirely inside pydantic-core
+Str50 = Annotated[str, StringConstraints(max_length=50)]
+Str100 = Annotated[str, StringConstraints(max_length=100)]
+
 class PaymentEvent(BaseModel):
+    model_config = ConfigDict(
+        extra="ignore",
+        validate_assignment=False,
+        use_enum_values=True,  # store enum values, skip Enum lookups on dump
+    )
+    
     # Core payment info
     user_id: str = Field(..., min_length=1, max_length=50)
     transaction_id: str = Field(..., min_length=1, max_length=100)
     amount: float = Field(..., gt=0, le=1000000)  # Max $1M
-    currency: str = Field(default="USD", min_length=3, max_length=3)
+    currency: Annotated[str, StringConstraints(to_upper=True, min_length=3, max_length=3)] = "USD"
     timestamp: datetime
     payment_method: PaymentMethod
     status: PaymentStatus
     
     # Merchant/Product info
-    merchant_id: Optional[str] = Field(None, max_length=50)
-    product_category: Optional[str] = Field(None, max_length=100)
+    merchant_id: Optional[Str50] = None
+    product_category: Optional[Str100] = None
     product_ids: Optional[List[str]] = Field(default_factory=list)
     
     # User behavior context
-    session_id: Optional[str] = Field(None, max_length=100)
+    session_id: Optional[Str100] = None
     device_info: Optional[DeviceInfo] = None
     location_info: Optional[LocationInfo] = None
     
@@ -63,11 +73,8 @@ class PaymentEvent(BaseModel):
     # Additional metadata
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict)
     
-    @validator('currency')
-    def validate_currency(cls, v):
-        return v.upper()
-    
-    @validator('amount')
+    @field_validator('amount', mode='after')
+    @classmethod
     def validate_amount(cls, v):
         return round(v, 2)  # Ensure 2 decimal places
 
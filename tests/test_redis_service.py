@@ -0,0 +1,55 @@
+import pytest
+import fakeredis.aioredis
+
+from app import database
+from app.redis_service import FraudRedisService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(database, "redis_client", client)
+    return FraudRedisService()
+
+
+@pytest.mark.asyncio
+async def test_flagged_user_is_suspicious(service):
+    await service.flag_suspicious_user("u1", "velocity", duration_hours=24)
+    assert await service.is_user_suspicious("u1") == (True, "velocity")
+
+    await service.unflag_user("u1")
+    assert await service.is_user_suspicious("u1") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_cached_risk_score_round_trip(service):
+    assert await service.get_cached_risk_score("u1") is None
+
+    await service.cache_user_risk_score("u1", 0.75)
+    assert await service.get_cached_risk_score("u1") == 0.75
+
+
+@pytest.mark.asyncio
+async def test_failed_attempts_count_up(service):
+    assert await service.get_failed_attempts("u1") == 0
+
+    await service.track_failed_attempt("u1")
+    await service.track_failed_attempt("u1")
+    assert await service.get_failed_attempts("u1") == 2
+
+
+@pytest.mark.asyncio
+async def test_short_lived_feature_does_not_shorten_hash_ttl(service):
+    await service.flag_suspicious_user("u1", "velocity", duration_hours=24)
+    await service.cache_user_risk_score("u1", 0.5, ttl=60)
+
+    assert await service.redis.ttl("user:features:u1") > 60
+
+
+@pytest.mark.asyncio
+async def test_track_async_without_flusher_swallows_redis_errors(service, monkeypatch):
+    async def broken_track(user_id, transaction_data):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(service, "track_user_transaction", broken_track)
+    await service.track_async("u1", {"transaction_id": "t1"})